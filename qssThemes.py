@@ -0,0 +1,160 @@
+#! /bin/env python
+"""
+Compile ``sample.css`` into a minified style sheet per theme
+
+``sample.css`` is a template with ``${name}`` placeholders. Each theme is a
+set of values for them, optionally overridden per user (e.g. ``accent``).
+Compiled style sheets are cached on disk, keyed by a hash of the template
+and the values, and in memory, so switching themes is a lookup.
+"""
+import os
+import re
+import json
+import hashlib
+from string import Template
+
+from PySide2.QtCore import (
+    QStandardPaths,
+)
+
+
+DARK = dict(
+    text="#ddd",
+    brightText="#fff",
+    mutedText="#999",
+    disabledText="#666",
+    buttonText="#ccc",
+    selectedText="#fff",
+    window="#444",
+    base="#303030",
+    hover="#333",
+    sunken="#222",
+    border="#666",
+    accent="#4167b0",
+    fontSize="10pt",
+    errorText="#faa",
+    errorBackground="#411",
+    warningText="#fda",
+    warningBackground="#431",
+)
+
+LIGHT = dict(
+    DARK,
+    text="#222",
+    brightText="#000",
+    mutedText="#666",
+    disabledText="#999",
+    buttonText="#333",
+    window="#eee",
+    base="#fff",
+    hover="#f4f4f4",
+    sunken="#ddd",
+    border="#aaa",
+    errorText="#a00",
+    errorBackground="#fdd",
+    warningText="#840",
+    warningBackground="#fec",
+)
+
+HIGH_CONTRAST = dict(
+    DARK,
+    text="#fff",
+    brightText="#fff",
+    mutedText="#fff",
+    disabledText="#8c8c8c",
+    buttonText="#fff",
+    selectedText="#000",
+    window="#000",
+    base="#000",
+    hover="#1a1a1a",
+    sunken="#000",
+    border="#fff",
+    accent="#ff0",
+    fontSize="12pt",
+    errorText="#fff",
+    errorBackground="#a00",
+    warningText="#000",
+    warningBackground="#fd0",
+)
+
+THEMES = {
+    "dark": DARK,
+    "light": LIGHT,
+    "highContrast": HIGH_CONTRAST,
+}
+
+_compiled = {}
+
+
+def templatePath():
+    """Path of the style sheet template"""
+    return os.path.join(os.path.dirname(__file__), "sample.css")
+
+
+def cacheDirectory():
+    """Directory compiled style sheets are written to"""
+    location = QStandardPaths.writableLocation(QStandardPaths.CacheLocation)
+    if not location:
+        location = os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(location, "qssThemes")
+
+
+def minify(qss):
+    """Strip comments and redundant whitespace from a style sheet"""
+    qss = re.sub(r"/\*.*?\*/", "", qss, flags=re.DOTALL)
+    qss = re.sub(r"\s+", " ", qss)
+    # Whitespace before ':' is left alone, it is significant in selectors
+    qss = re.sub(r"\s*([{};,])\s*", r"\1", qss)
+    qss = re.sub(r":\s+", ":", qss)
+    return qss.replace(";}", "}").strip()
+
+
+def compileTheme(theme="dark", **variables):
+    """
+    Style sheet for a theme, compiled from the template
+
+    :param theme: key in ``THEMES``
+    :param variables: values overriding the theme, e.g. ``accent="#c05"``
+    :return: minified style sheet
+    """
+    path = templatePath()
+    memoryKey = (theme, tuple(sorted(variables.items())),
+                 os.path.getmtime(path))
+    qss = _compiled.get(memoryKey)
+    if qss is not None:
+        return qss
+
+    values = dict(THEMES[theme])
+    values.update(variables)
+    with open(path, "r") as fh:
+        template = fh.read()
+
+    digest = hashlib.sha1(
+        (template + json.dumps(values, sort_keys=True)).encode("utf-8")
+    ).hexdigest()
+    cachePath = os.path.join(
+        cacheDirectory(), "{}-{}.qss".format(theme, digest[:16]))
+
+    try:
+        with open(cachePath, "r") as fh:
+            qss = fh.read()
+    except (IOError, OSError):
+        # Comments go first, they may mention placeholders
+        template = re.sub(r"/\*.*?\*/", "", template, flags=re.DOTALL)
+        qss = minify(Template(template).substitute(values))
+        _writeCache(cachePath, qss)
+
+    _compiled[memoryKey] = qss
+    return qss
+
+
+def _writeCache(cachePath, qss):
+    """Write a compiled style sheet, a failure only costs a recompile"""
+    tempPath = "{}.{}.tmp".format(cachePath, os.getpid())
+    try:
+        os.makedirs(os.path.dirname(cachePath), exist_ok=True)
+        with open(tempPath, "w") as fh:
+            fh.write(qss)
+        os.replace(tempPath, cachePath)
+    except (IOError, OSError):
+        pass
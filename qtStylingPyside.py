@@ -1,10 +1,18 @@
 #! /bin/env python
 import os
 import sys
+import json
+import time
+import weakref
 
 from PySide2.QtCore import (
     Qt,
+    QObject,
+    QEvent,
+    QElapsedTimer,
     QResource,
+    QRect,
+    QRectF,
     QTimer,
 )
 
@@ -14,6 +22,7 @@ from PySide2.QtGui import (
     QBrush,
     QPen,
     QPainter,
+    QPixmap,
 )
 
 from PySide2.QtWidgets import (
@@ -21,6 +30,8 @@ from PySide2.QtWidgets import (
     QWidget,
     QGroupBox,
     QPushButton,
+    QCheckBox,
+    QFileDialog,
     QVBoxLayout,
     QLineEdit,
     QComboBox,
@@ -31,19 +42,160 @@ from PySide2.QtWidgets import (
     QProgressBar,
 )
 
+import qssThemes
+
 
 __version__ = "0.0.1"
 
 
+class AnimationClock(QObject):
+    """
+    A single timer shared by every animated widget
+
+    Widgets subscribe with a callback that receives the milliseconds elapsed
+    since the previous tick and returns False once it is done animating.
+    The clock ticks at the shortest interval any subscriber asked for, frame
+    aligned for per-frame animation and coarse otherwise. Bound method
+    callbacks are held weakly so a subscription never keeps its owner alive.
+    Hidden or fully obscured subscribers are skipped, and the timer only runs
+    while at least one subscriber can be seen, so idle wakeups do not grow
+    with the number of widgets. An obscured widget that is uncovered again is
+    repainted, which restarts the clock.
+    """
+
+    frameInterval = 16
+
+    _instance = None
+
+    @classmethod
+    def instance(cls):
+        """The clock shared by the whole application"""
+        if cls._instance is None:
+            cls._instance = cls(QApplication.instance())
+        return cls._instance
+
+    def __init__(self, parent=None):
+        super(AnimationClock, self).__init__(parent)
+        self._subscribers = {}
+        self._elapsed = QElapsedTimer()
+        self._timer = QTimer(self)
+        self._timer.setInterval(self.frameInterval)
+        self._timer.timeout.connect(self._tick)
+
+    def subscribe(self, widget, callback, interval=None):
+        """
+        Call ``callback(elapsedMs)`` while widget is visible
+
+        :param interval: milliseconds between calls, one frame by default
+        """
+        if widget not in self._subscribers:
+            widget.installEventFilter(self)
+            widget.destroyed.connect(
+                lambda *args, w=widget: self._forget(w))
+        if hasattr(callback, "__self__"):
+            reference = weakref.WeakMethod(callback)
+        else:
+            reference = lambda: callback
+        self._subscribers[widget] = (
+            reference, interval or self.frameInterval)
+        self._updateInterval()
+        self._updateTimer()
+
+    def unsubscribe(self, widget):
+        """Stop animating a widget"""
+        if self._subscribers.pop(widget, None) is not None:
+            widget.removeEventFilter(self)
+        self._updateInterval()
+        self._updateTimer()
+
+    def isActive(self):
+        """Whether the clock is currently waking up"""
+        return self._timer.isActive()
+
+    def eventFilter(self, watched, event):
+        if event.type() in (QEvent.Show, QEvent.Hide):
+            self._updateTimer()
+        elif event.type() == QEvent.Paint:
+            self.widgetPainted(watched)
+        return False
+
+    def widgetPainted(self, widget):
+        """
+        Restart the clock if a subscriber painted after being uncovered
+
+        Event filters that consume paint events must call this themselves,
+        see ``PaintProfiler``.
+        """
+        if (widget in self._subscribers
+                and not self._timer.isActive()
+                and self._isShown(widget)):
+            self._elapsed.start()
+            self._timer.start()
+
+    @staticmethod
+    def _isShown(widget):
+        """Visible and not entirely covered by siblings or clipped away"""
+        return widget.isVisible() and not widget.visibleRegion().isEmpty()
+
+    def _forget(self, widget):
+        self._subscribers.pop(widget, None)
+        self._updateInterval()
+        self._updateTimer()
+
+    def _updateInterval(self):
+        """Tick as slowly as the subscribers allow"""
+        interval = min([i for _, i in self._subscribers.values()]
+                       or [self.frameInterval])
+        self._timer.setTimerType(
+            Qt.PreciseTimer if interval <= self.frameInterval
+            else Qt.CoarseTimer)
+        self._timer.setInterval(interval)
+
+    def _updateTimer(self):
+        """Run the timer only while some subscriber can be seen"""
+        shown = any(self._isShown(w) for w in self._subscribers)
+        if shown and not self._timer.isActive():
+            self._elapsed.start()
+            self._timer.start()
+        elif not shown and self._timer.isActive():
+            self._timer.stop()
+
+    def _tick(self):
+        elapsed = self._elapsed.restart()
+        finished = []
+        shown = False
+        for widget, (reference, _) in list(self._subscribers.items()):
+            callback = reference()
+            if callback is None:
+                # The owner was garbage collected
+                finished.append(widget)
+                continue
+            if not self._isShown(widget):
+                continue
+            if callback(elapsed) is False:
+                finished.append(widget)
+            else:
+                shown = True
+        for widget in finished:
+            self._subscribers.pop(widget, None)
+            widget.removeEventFilter(self)
+        if finished:
+            self._updateInterval()
+        if not shown:
+            # Everything left is hidden or obscured, wait for a show or paint
+            self._timer.stop()
+
+
 class DefaultWidget(QWidget):
     """Default widget with no style mods"""
 
     button = None
     line = None
     combo = None
-    timer = None
     progress = None
 
+    progressStepInterval = 100
+
     ComboBoxType = QComboBox
 
     @classmethod
@@ -113,18 +265,30 @@ class DefaultWidget(QWidget):
         progressBar.setRange(0, 1000)
         progressBar.setValue(0)
 
-        self.timer = timer = QTimer(self)
-        timer.timeout.connect(self.advanceProgressBar)
-        timer.start(100)
+        self._progressElapsed = 0
+        AnimationClock.instance().subscribe(
+            progressBar, self.advanceProgressBar,
+            interval=self.progressStepInterval)
 
         return progressBar
 
-    def advanceProgressBar(self):
-        curVal = self.progress.value()
-        maxVal = self.progress.maximum()
-        self.progress.setValue((curVal + (maxVal - curVal) / 10) + 9)
-        if self.progress.value() == 1000:
-            self.timer.stop()
+    def advanceProgressBar(self, elapsed=None):
+        """
+        Step the progress bar once per ``progressStepInterval`` ms
+
+        :return: False once the bar is full and no longer needs frames
+        """
+        if elapsed is None:
+            elapsed = self.progressStepInterval
+        self._progressElapsed += elapsed
+        while self._progressElapsed >= self.progressStepInterval:
+            self._progressElapsed -= self.progressStepInterval
+            curVal = self.progress.value()
+            maxVal = self.progress.maximum()
+            # QProgressBar ignores out of range values, clamp so we reach max
+            self.progress.setValue(
+                min(maxVal, int(curVal + (maxVal - curVal) / 10 + 9)))
+        return self.progress.value() < self.progress.maximum()
 
 
 class PaletteWidget(DefaultWidget):
@@ -164,6 +328,90 @@ class PaletteWidget(DefaultWidget):
         self.line.setPalette(palette)
 
 
+class StyleRegistry(object):
+    """
+    Keeps created ``QStyle`` instances alive for reuse
+
+    ``QStyleFactory.keys()`` is enumerated once. Each style is created the
+    first time it is needed, or ahead of time with ``prewarm``, and is reused
+    on every later apply so its internal caches survive style switches.
+    """
+
+    _keys = None
+    _styles = {}
+    _holder = None
+
+    @classmethod
+    def keys(cls):
+        """Map of lower-cased style keys to the names the factory uses"""
+        if cls._keys is None:
+            keys = sorted(QStyleFactory.keys())
+            print("\n\nAvailable styles: " + ", ".join(keys))
+            cls._keys = dict((k.lower(), k) for k in keys)
+        return cls._keys
+
+    @classmethod
+    def styleName(cls, name):
+        """Factory name for a case-insensitive style name, None if unknown"""
+        return cls.keys().get(name.lower())
+
+    @classmethod
+    def style(cls, name):
+        """The shared instance of a style, created on first request"""
+        key = cls.styleName(name)
+        if key is None:
+            return None
+        style = cls._styles.get(key)
+        if style is None:
+            style = cls._styles[key] = QStyleFactory.create(key)
+            style.setParent(cls._holderObject())
+        return style
+
+    @classmethod
+    def apply(cls, name):
+        """
+        Make a style the application style, reusing an existing instance
+        """
+        style = cls.style(name)
+        if style is None:
+            return None
+        app = QApplication.instance()
+        if app.style() is style:
+            return style
+        # QApplication deletes the style it replaces when it is the parent.
+        # Hand every registered style back to the holder so they survive.
+        holder = cls._holderObject()
+        for registered in cls._styles.values():
+            if registered is not style:
+                registered.setParent(holder)
+        app.setStyle(style)
+        return style
+
+    @classmethod
+    def prewarm(cls, names=None, interval=0):
+        """
+        Create styles in the background, one per event loop iteration
+
+        QStyle is a GUI object and can only be built on the GUI thread, so
+        creation is spread across idle event loop iterations instead.
+        """
+        pending = list(cls.keys().values() if names is None else names)
+
+        def createNext():
+            if pending:
+                cls.style(pending.pop(0))
+            if pending:
+                QTimer.singleShot(interval, createNext)
+
+        QTimer.singleShot(interval, createNext)
+
+    @classmethod
+    def _holderObject(cls):
+        if cls._holder is None:
+            cls._holder = QObject(QApplication.instance())
+        return cls._holder
+
+
 class StyleWidget(DefaultWidget):
     """
     A widget that customizes its appearance by changing style factories
@@ -196,26 +444,83 @@ class StyleWidget(DefaultWidget):
             https://doc.qt.io/qt-5/qstylefactory.html
 
         """
-        print("\n\nAvailable styles: " + ", ".join(
-            sorted(QStyleFactory.keys())))
         style = "Fusion"
         for arg in args:
-            if arg.lower() in [k.lower() for k in QStyleFactory.keys()]:
+            if StyleRegistry.styleName(arg):
                 style = arg
-        style = QStyleFactory.create(style)
-        QApplication.instance().setStyle(style)
+        StyleRegistry.apply(style)
 
 
-def getStyleSheet():
+def getStyleSheet(theme="dark", **variables):
     """
-    Reads in the style sheet resource
+    Reads in the style sheet resource, compiled for a theme
+
+    See ``qssThemes.compileTheme`` for the theme names and variables.
     """
     dirname = os.path.dirname(__file__)
     rccPath = os.path.join(dirname, "resources.rcc")
     QResource.registerResource(rccPath)
-    qssPath = os.path.join(dirname, "sample.css")
-    with open(qssPath, "r") as fh:
-        return fh.read()
+    return qssThemes.compileTheme(theme, **variables)
+
+
+def restyleWidgets(changes):
+    """
+    Apply property changes to many widgets and re-polish them in one batch
+
+    Style sheet selectors such as ``[hasError=true]`` or ``#ErrorWidget`` are
+    only re-evaluated when a widget is re-polished. Doing that one widget at a
+    time recomputes and repaints each of them separately. Here updates are
+    suspended on the affected windows while every widget is re-polished once,
+    so the whole change shows up in a single repaint.
+
+    :param changes: iterable of ``(widget, {name: value})`` pairs. The name
+        ``objectName`` sets the object name, anything else a dynamic property.
+        A widget may appear more than once, its changes are merged.
+    :return: list of the widgets whose effective values changed
+    """
+    merged = {}
+    for widget, properties in changes:
+        merged.setdefault(widget, {}).update(properties)
+
+    changed = []
+    for widget, properties in merged.items():
+        dirty = False
+        for name, value in properties.items():
+            if name == "objectName":
+                if widget.objectName() != value:
+                    widget.setObjectName(value)
+                    dirty = True
+            else:
+                current = widget.property(name)
+                # An unset dynamic property reads as None and matches the
+                # same selectors as a falsy value, e.g. [hasError=true]
+                if current == value or (current is None and not value):
+                    continue
+                widget.setProperty(name, value)
+                dirty = True
+        if dirty:
+            changed.append(widget)
+
+    if not changed:
+        return changed
+
+    windows = []
+    for widget in changed:
+        window = widget.window()
+        if window not in windows and window.updatesEnabled():
+            window.setUpdatesEnabled(False)
+            windows.append(window)
+    try:
+        for widget in changed:
+            style = widget.style()
+            style.unpolish(widget)
+            style.polish(widget)
+    finally:
+        # Re-enabling updates schedules one update of each window
+        for window in windows:
+            window.setUpdatesEnabled(True)
+
+    return changed
 
 
 class QssWidget(DefaultWidget):
@@ -244,25 +549,84 @@ class QssWidget(DefaultWidget):
     def setInstanceStyle(self, *args):
         """
         Set style applied to this instance in a running application
+
+        Without "error" any previously applied error styling is cleared.
         """
-        widgets = [
-            self.line, self.combo, self.button,
-        ]
-        if "error" in args:
-            self.line.setProperty('hasError', True)
-            self.combo.setObjectName('ErrorWidget')
-            self.button.setObjectName('ErrorWidget')
+        restyleWidgets(self.instanceStyleChanges(*args))
+
+    def instanceStyleChanges(self, *args):
+        """
+        Property changes for this instance's style, see ``restyleWidgets``
 
-            for widget in widgets:
-                widget.style().unpolish(widget)
-                widget.style().polish(widget)
+        Collect these from many widgets to restyle a whole form in one batch.
+        """
+        error = "error" in args
+        errorName = 'ErrorWidget' if error else ''
+        return [
+            (self.line, {'hasError': error}),
+            (self.combo, {'objectName': errorName}),
+            (self.button, {'objectName': errorName}),
+        ]
 
 
 class PaintedComboBox(QComboBox):
     """
     A combo box that allows for custom painting
+
+    The style option is kept between paints and only re-initialized when
+    the state it is built from changes. Rendered frames are cached per state,
+    so repainting an unchanged combo box is a single pixmap copy. Set
+    ``cacheFrames`` to False to build and draw everything on every paint.
     """
 
+    cacheFrames = True
+    maxCachedFrames = 8
+
+    def __init__(self, *args, **kwargs):
+        super(PaintedComboBox, self).__init__(*args, **kwargs)
+        self._options = QStyleOptionComboBox()
+        self._optionsKey = None
+        self._frames = {}
+
+    def changeEvent(self, event):
+        if event.type() in (QEvent.StyleChange, QEvent.FontChange):
+            # Neither shows up in the state key, drop what was built with them
+            self._optionsKey = None
+            self._frames.clear()
+        super(PaintedComboBox, self).changeEvent(event)
+
+    def resizeEvent(self, event):
+        self._frames.clear()
+        super(PaintedComboBox, self).resizeEvent(event)
+
+    def stateKey(self):
+        """Everything the painted frame depends on"""
+        return (
+            self.isEnabled(),
+            self.isActiveWindow(),
+            self.underMouse(),
+            self.hasFocus(),
+            self.currentText(),
+            self.palette().cacheKey(),
+            self.width(),
+            self.height(),
+            self.devicePixelRatioF(),
+        )
+
+    def styleOptions(self, key=None):
+        """The cached style option, re-initialized if the state changed"""
+        key = self.stateKey() if key is None else key
+        if key != self._optionsKey:
+            options = self._options
+            options.initFrom(self)
+
+            # Customize the painting options to control the way the combo box
+            # is painted by QStyle.
+            options.currentText = 'MY CUSTOM TEXT'
+            options.frame = False
+            self._optionsKey = key
+        return self._options
+
     def paintEvent(self, event):
         """
         A customized paint event
@@ -273,18 +637,40 @@ class PaintedComboBox(QComboBox):
             paint event using the ``QStylePainter``. In this case we customize
             the text displayed for our combo box without losing the assigned style.
         """
-        options = QStyleOptionComboBox()
-        options.initFrom(self)
-
-        # Customize the painting options to control the way the combo box is
-        # painted by QStyle.
-        options.currentText = 'MY CUSTOM TEXT'
-        options.frame = False
+        if not self.cacheFrames:
+            options = QStyleOptionComboBox()
+            options.initFrom(self)
+            options.currentText = 'MY CUSTOM TEXT'
+            options.frame = False
+            painter = QStylePainter(self)
+            painter.drawComplexControl(QStyle.CC_ComboBox, options)
+            painter.drawControl(QStyle.CE_ComboBoxLabel, options)
+            return
+
+        key = self.stateKey()
+        frame = self._frames.get(key)
+        if frame is None:
+            frame = self._renderFrame(self.styleOptions(key))
+            if len(self._frames) >= self.maxCachedFrames:
+                self._frames.clear()
+            self._frames[key] = frame
+
+        QPainter(self).drawPixmap(0, 0, frame)
+
+    def _renderFrame(self, options):
+        """Render the combo box for the given options into a pixmap"""
+        dpr = self.devicePixelRatioF()
+        frame = QPixmap(int(round(self.width() * dpr)),
+                        int(round(self.height() * dpr)))
+        frame.setDevicePixelRatio(dpr)
+        frame.fill(Qt.transparent)
 
         # Use the QStylePainter to ensure styling is still applied.
-        painter = QStylePainter(self)
+        painter = QStylePainter(frame, self)
         painter.drawComplexControl(QStyle.CC_ComboBox, options)
         painter.drawControl(QStyle.CE_ComboBoxLabel, options)
+        painter.end()
+        return frame
 
 
 class PaintedWidget(DefaultWidget):
@@ -293,6 +679,11 @@ class PaintedWidget(DefaultWidget):
     """
     ComboBoxType = PaintedComboBox
 
+    cacheBackground = True
+
+    _background = None
+    _backgroundKey = None
+
     @classmethod
     def setGlobalStyle(cls):
         """
@@ -300,10 +691,19 @@ class PaintedWidget(DefaultWidget):
         """
         QApplication.instance().setStyleSheet(getStyleSheet())
 
+    def changeEvent(self, event):
+        if event.type() in (QEvent.StyleChange, QEvent.PaletteChange):
+            self._background = None
+        super(PaintedWidget, self).changeEvent(event)
+
     def paintEvent(self, event):
         """
         A customized paint event
 
+        The background is rendered once into a pixmap that matches the
+        widget's size and device pixel ratio, each paint then only copies the
+        exposed area. Set ``cacheBackground`` to False to paint directly.
+
         .. note::
 
             Manually painting a widget takes complete, manual control of its
@@ -314,6 +714,43 @@ class PaintedWidget(DefaultWidget):
             before or after the inherited call of course paints that content
             under or over the original content.
 
+        """
+        painter = QPainter(self)
+        if not self.cacheBackground:
+            self.paintBackground(painter)
+            return
+
+        pixmap = self.backgroundPixmap()
+        dpr = pixmap.devicePixelRatio()
+        target = QRectF(event.rect())
+        # The source rectangle is in the pixmap's device pixels.
+        source = QRectF(target.x() * dpr, target.y() * dpr,
+                        target.width() * dpr, target.height() * dpr)
+        painter.drawPixmap(target, pixmap, source)
+
+    def backgroundPixmap(self):
+        """
+        The background rendered at the current size and device pixel ratio
+
+        Regenerated only when the size changes or after a style change.
+        """
+        dpr = self.devicePixelRatioF()
+        key = (self.width(), self.height(), dpr)
+        if self._background is None or self._backgroundKey != key:
+            pixmap = QPixmap(int(round(self.width() * dpr)),
+                             int(round(self.height() * dpr)))
+            pixmap.setDevicePixelRatio(dpr)
+            pixmap.fill(Qt.transparent)
+            painter = QPainter(pixmap)
+            self.paintBackground(painter)
+            painter.end()
+            self._background = pixmap
+            self._backgroundKey = key
+        return self._background
+
+    def paintBackground(self, painter):
+        """
+        Paint the magenta background and cross with the given painter
         """
         geometry = self.geometry()
 
@@ -327,7 +764,6 @@ class PaintedWidget(DefaultWidget):
         # outline appears inside the widget.
         geometry.adjust(0, 0, -1, -1)
 
-        painter = QPainter(self)
         painter.setRenderHint(QPainter.Antialiasing)
 
         # The painter's assigned brush is used to fill any 2D vector shapes that
@@ -348,6 +784,184 @@ class PaintedWidget(DefaultWidget):
         painter.drawLine(geometry.bottomLeft(), geometry.topRight())
 
 
+class PaintProfiler(QObject):
+    """
+    Times the paint events of a demo widget and its children
+
+    Installed as an event filter, the profiler delivers each paint event
+    itself so it can time it, records the duration in a per-widget histogram
+    and then draws that widget's numbers over what was just painted. The
+    widget with the worst mean paint time is outlined in red. Repaints the
+    profiler requests to move that outline are drawn but not recorded.
+
+    The profiler consumes the paint events it delivers, so filters installed
+    before it never see them. It tells the ``AnimationClock`` about each
+    paint in their place.
+    """
+
+    childNames = ("button", "line", "combo", "progress")
+
+    # Upper bounds of the histogram buckets in milliseconds, the last bucket
+    # collects everything slower.
+    bucketBounds = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 25.0, 50.0)
+
+    def __init__(self, parent=None):
+        super(PaintProfiler, self).__init__(parent)
+        self._labels = {}
+        self._stats = {}
+        self._worst = None
+        self._unrecorded = set()
+        # Widgets whose destroyed signal is connected, held weakly so the
+        # profiler never keeps a replaced demo widget alive
+        self._connected = weakref.WeakSet()
+
+    def attach(self, demoWidget):
+        """Start timing a demo widget and its children"""
+        self.detach()
+        name = type(demoWidget).__name__
+        targets = [(name, demoWidget)]
+        for childName in self.childNames:
+            child = getattr(demoWidget, childName, None)
+            if child is not None:
+                targets.append(("{}.{}".format(name, childName), child))
+        for label, widget in targets:
+            self._labels[widget] = label
+            widget.installEventFilter(self)
+            if widget not in self._connected:
+                self._connected.add(widget)
+                widget.destroyed.connect(
+                    lambda *args, ref=weakref.ref(widget): self._forget(ref))
+            widget.update()
+
+    def detach(self):
+        """Stop timing, recorded statistics are kept"""
+        labels, self._labels = self._labels, {}
+        for widget in labels:
+            widget.removeEventFilter(self)
+            widget.update()
+        self._worst = None
+        self._unrecorded.clear()
+
+    def clear(self):
+        """Forget all recorded statistics"""
+        self._stats.clear()
+
+    def eventFilter(self, watched, event):
+        if event.type() != QEvent.Paint or watched not in self._labels:
+            return False
+        start = time.perf_counter()
+        watched.event(event)
+        elapsed = 1000.0 * (time.perf_counter() - start)
+
+        label = self._labels[watched]
+        if watched in self._unrecorded:
+            # Requested by _updateWorst, timing it would skew the numbers
+            self._unrecorded.discard(watched)
+        else:
+            self.record(label, elapsed)
+            self._updateWorst()
+        if label in self._stats:
+            self._drawOverlay(watched, label)
+        # Returning True hides this paint from the clock's own filter
+        AnimationClock.instance().widgetPainted(watched)
+        return True
+
+    def record(self, label, elapsed):
+        """Add a paint time in milliseconds to a widget's histogram"""
+        stats = self._stats.get(label)
+        if stats is None:
+            stats = self._stats[label] = dict(
+                count=0, total=0.0, max=0.0,
+                buckets=[0] * (len(self.bucketBounds) + 1))
+        stats["count"] += 1
+        stats["total"] += elapsed
+        stats["max"] = max(stats["max"], elapsed)
+        index = len(self.bucketBounds)
+        for i, bound in enumerate(self.bucketBounds):
+            if elapsed <= bound:
+                index = i
+                break
+        stats["buckets"][index] += 1
+
+    def percentile(self, label, fraction):
+        """Upper bucket bound below which ``fraction`` of paints fall"""
+        stats = self._stats[label]
+        threshold = fraction * stats["count"]
+        seen = 0
+        for bound, count in zip(self.bucketBounds, stats["buckets"]):
+            seen += count
+            if seen >= threshold:
+                return bound
+        return stats["max"]
+
+    def statistics(self):
+        """Recorded paint times per widget, ready for JSON"""
+        result = {}
+        for label, stats in sorted(self._stats.items()):
+            bounds = list(self.bucketBounds) + [None]
+            result[label] = dict(
+                count=stats["count"],
+                meanMs=stats["total"] / stats["count"],
+                p95Ms=self.percentile(label, 0.95),
+                maxMs=stats["max"],
+                histogram=[dict(upToMs=bound, count=count)
+                           for bound, count in zip(bounds, stats["buckets"])],
+            )
+        return result
+
+    def exportJson(self, filePath):
+        """Write the recorded statistics to a JSON file"""
+        with open(filePath, "w") as fh:
+            json.dump(self.statistics(), fh, indent=2, sort_keys=True)
+
+    def _forget(self, reference):
+        widget = reference()
+        if widget is None:
+            return
+        self._labels.pop(widget, None)
+        self._unrecorded.discard(widget)
+        if widget is self._worst:
+            self._worst = None
+
+    def _mean(self, label):
+        stats = self._stats.get(label)
+        return stats["total"] / stats["count"] if stats else 0.0
+
+    def _updateWorst(self):
+        """Move the red outline when the slowest widget changes"""
+        worst = max(self._labels, default=None,
+                    key=lambda w: self._mean(self._labels[w]))
+        if worst is not self._worst:
+            # Repaint both so the outline moves, outside this paint event.
+            # Those paints are not recorded, see eventFilter.
+            for widget in (self._worst, worst):
+                if widget is not None:
+                    self._unrecorded.add(widget)
+                    QTimer.singleShot(0, widget.update)
+            self._worst = worst
+
+    def _drawOverlay(self, widget, label):
+        """Draw a widget's paint statistics on top of it"""
+        stats = self._stats[label]
+        text = "{:.2f} / {:.2f} / {:.2f} ms".format(
+            stats["total"] / stats["count"],
+            self.percentile(label, 0.95),
+            stats["max"])
+
+        painter = QPainter(widget)
+        metrics = painter.fontMetrics()
+        box = QRect(0, 0, metrics.horizontalAdvance(text) + 6,
+                    metrics.height() + 2)
+        painter.fillRect(box, QColor(0, 0, 0, 160))
+        painter.setPen(QColor(255, 255, 255))
+        painter.drawText(box, Qt.AlignCenter, text)
+        if widget is self._worst:
+            painter.setPen(QPen(QColor(255, 0, 0), 2))
+            painter.setBrush(Qt.NoBrush)
+            painter.drawRect(widget.rect().adjusted(1, 1, -1, -1))
+        painter.end()
+
+
 class ControllerWidget(QWidget):
 
     _WidgetType = DefaultWidget
@@ -367,7 +981,14 @@ class ControllerWidget(QWidget):
             ControllerWidget._WidgetType.init()
         widget.show()
 
+        self._widgetPool = {}
+        self._globalStyle = \
+            ControllerWidget._WidgetType.initGlobalStyle.__func__
+
         self.styleCombo = styleCombo = QComboBox()
+        self.poolCheck = poolCheck = QCheckBox("&Pool widgets")
+        self.profileCheck = profileCheck = QCheckBox("P&rofile painting")
+        exportButton = QPushButton("Export Timings")
         applyButton = QPushButton("&Apply")
         errorButton = QPushButton("Error")
         addButton = QPushButton("Add")
@@ -381,11 +1002,23 @@ class ControllerWidget(QWidget):
             "Add QSS styling to test mixing with custom paintEvent")
         quitButton.setToolTip(
             "Quit the application")
+        poolCheck.setToolTip(
+            "Keep one instance per style alive and switch by hiding and "
+            "showing them")
+        profileCheck.setToolTip(
+            "Time paint events and show mean / p95 / max over each widget")
+        exportButton.setToolTip(
+            "Save the recorded paint times as JSON")
+
+        self._profiler = PaintProfiler(self)
 
         styleCombo.addItems(sorted(self.widget_type_map.keys()))
 
         layout = QVBoxLayout(self)
         layout.addWidget(styleCombo)
+        layout.addWidget(poolCheck)
+        layout.addWidget(profileCheck)
+        layout.addWidget(exportButton)
         layout.addWidget(applyButton)
         layout.addWidget(addButton)
         layout.addWidget(errorButton)
@@ -396,9 +1029,17 @@ class ControllerWidget(QWidget):
         addButton.clicked.connect(self.onAddClicked)
         errorButton.clicked.connect(self.onErrorClicked)
         quitButton.clicked.connect(self.close)
+        poolCheck.toggled.connect(self.onPoolToggled)
+        profileCheck.toggled.connect(self.onProfileToggled)
+        exportButton.clicked.connect(self.onExportClicked)
 
     def closeEvent(self, event):
+        self._profiler.detach()
         ControllerWidget._demoWidget.deleteLater()
+        for pooled in self._widgetPool.values():
+            if pooled is not ControllerWidget._demoWidget:
+                pooled.deleteLater()
+        self._widgetPool.clear()
         event.accept()
 
     def onApplyClicked(self):
@@ -406,9 +1047,68 @@ class ControllerWidget(QWidget):
         uiSelection = self.styleCombo.currentText()
         uiType = self.widget_type_map.get(uiSelection)
         ControllerWidget._WidgetType = uiType
-        new = ControllerWidget._demoWidget = uiType.init()
-        new.show()
-        widget.close()
+        if self.poolCheck.isChecked():
+            self._showPooledWidget(uiType)
+        else:
+            new = ControllerWidget._demoWidget = uiType.init()
+            self._globalStyle = uiType.initGlobalStyle.__func__
+            new.show()
+            widget.close()
+        if self.profileCheck.isChecked():
+            self._profiler.attach(ControllerWidget._demoWidget)
+
+    def onProfileToggled(self, checked):
+        """
+        Start or stop timing the paint events of the demo widget
+        """
+        if checked:
+            self._profiler.attach(ControllerWidget._demoWidget)
+        else:
+            self._profiler.detach()
+
+    def onExportClicked(self):
+        """
+        Save the recorded paint times to a JSON file
+        """
+        filePath = QFileDialog.getSaveFileName(
+            self, "Export Paint Timings", "paintTimings.json",
+            "JSON (*.json)")[0]
+        if filePath:
+            self._profiler.exportJson(filePath)
+
+    def onPoolToggled(self, checked):
+        """
+        Start or stop keeping built demo widgets around for reuse
+        """
+        current = ControllerWidget._demoWidget
+        if checked:
+            self._widgetPool[type(current)] = current
+            return
+        for pooled in self._widgetPool.values():
+            if pooled is not current:
+                pooled.deleteLater()
+        self._widgetPool.clear()
+
+    def _showPooledWidget(self, uiType):
+        """
+        Show the pooled instance of a demo widget type, building it once
+
+        Instances are hidden rather than closed, so switching back to a type
+        only costs a show. The global style is re-applied only when it differs
+        from the one currently in effect, e.g. ``default`` and ``painted``
+        share theirs.
+        """
+        widget = ControllerWidget._demoWidget
+        new = self._widgetPool.get(uiType)
+        if new is None:
+            new = self._widgetPool[uiType] = uiType.init()
+        elif uiType.initGlobalStyle.__func__ is not self._globalStyle:
+            uiType.initGlobalStyle()
+        self._globalStyle = uiType.initGlobalStyle.__func__
+        ControllerWidget._demoWidget = new
+        if new is not widget:
+            new.show()
+            widget.hide()
 
     def onErrorClicked(self):
         widget = ControllerWidget._demoWidget
@@ -417,11 +1117,14 @@ class ControllerWidget(QWidget):
     def onAddClicked(self):
         widget = ControllerWidget._demoWidget
         widget.setGlobalStyle()
+        # The global style no longer matches any initGlobalStyle
+        self._globalStyle = None
 
 
 if __name__ == "__main__":
     _app = QApplication(sys.argv)
-    _app.setStyle("Fusion")
+    StyleRegistry.apply("Fusion")
+    StyleRegistry.prewarm()
 
     ui = ControllerWidget()
     ui.show()
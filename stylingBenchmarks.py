@@ -0,0 +1,366 @@
+#! /bin/env python
+"""
+Rendering benchmarks for the widgets in qtStylingPyside
+
+Runs headless on the offscreen platform unless ``QT_QPA_PLATFORM`` is set::
+
+    python stylingBenchmarks.py painted combo
+    python stylingBenchmarks.py stress --counts 10 100 1000 --json stress.json
+"""
+import os
+import gc
+import sys
+import json
+import math
+import time
+import argparse
+import subprocess
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide2.QtCore import (
+    QEvent,
+    QRect,
+)
+
+from PySide2.QtWidgets import (
+    QApplication,
+    QWidget,
+    QComboBox,
+    QGridLayout,
+)
+
+import qtStylingPyside as styling
+
+
+def timeIt(func, repeat=1):
+    """Seconds taken to call func ``repeat`` times"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return time.perf_counter() - start
+
+
+def residentMemory():
+    """Resident set size in bytes, None where /proc is unavailable"""
+    try:
+        with open("/proc/self/statm") as fh:
+            pages = int(fh.read().split()[1])
+    except (IOError, OSError, IndexError, ValueError):
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE")
+
+
+def disposeWidget(widget):
+    """Close a top level widget and delete it right away"""
+    widget.close()
+    widget.deleteLater()
+    QApplication.sendPostedEvents(None, QEvent.DeferredDelete)
+    QApplication.processEvents()
+
+
+def printResults(title, results, baseline):
+    """
+    Print milliseconds per paint for each path and workload
+
+    :param results: {path: {workload: (seconds, paintCount)}}
+    :param baseline: path the speedup column is relative to
+    """
+    print("\n" + title)
+    print("{:<12} {:<16} {:>12} {:>12} {:>8}".format(
+        "path", "workload", "ms/paint", "paints/s", "speedup"))
+    for path, workloads in results.items():
+        for workload, (seconds, count) in workloads.items():
+            baseSeconds, baseCount = results[baseline][workload]
+            speedup = (baseSeconds / baseCount) / (seconds / count)
+            print("{:<12} {:<16} {:>12.4f} {:>12.0f} {:>7.2f}x".format(
+                path, workload, 1000.0 * seconds / count,
+                count / seconds, speedup))
+
+
+def benchmarkPaintedWidget(repeat=200):
+    """
+    Compare the cached and direct PaintedWidget background paths
+
+    ``resize`` repaints the whole widget at a new size every time, which
+    forces the cache to regenerate. ``partial-expose`` repaints small regions
+    of a widget that does not change size, which is served from the cache.
+    """
+    sizes = [(200 + 7 * i, 150 + 5 * i) for i in range(20)]
+    exposed = [QRect(x, y, 32, 32) for x in range(0, 160, 40)
+               for y in range(0, 120, 40)]
+
+    results = {}
+    original = styling.PaintedWidget.cacheBackground
+    try:
+        for path, cached in (("direct", False), ("cached", True)):
+            styling.PaintedWidget.cacheBackground = cached
+            widget = styling.PaintedWidget.init()
+            widget.show()
+            QApplication.processEvents()
+
+            def resize():
+                for width, height in sizes:
+                    widget.resize(width, height)
+                    widget.repaint()
+
+            def partialExpose():
+                for rect in exposed:
+                    widget.repaint(rect)
+
+            widget.resize(*sizes[0])
+            widget.repaint()
+            results[path] = {
+                "resize": (timeIt(resize, repeat // 10 or 1),
+                           len(sizes) * (repeat // 10 or 1)),
+                "partial-expose": (timeIt(partialExpose, repeat),
+                                   len(exposed) * repeat),
+            }
+            disposeWidget(widget)
+    finally:
+        styling.PaintedWidget.cacheBackground = original
+
+    printResults("PaintedWidget.paintEvent", results, "direct")
+    return results
+
+
+def benchmarkPaintedComboBox(repeat=200, count=500):
+    """
+    Compare repainting a form full of combo boxes
+
+    The stock ``QComboBox`` is the baseline, against ``PaintedComboBox``
+    with and without its option and frame caches.
+    """
+    paths = (
+        ("QComboBox", QComboBox, None),
+        ("direct", styling.PaintedComboBox, False),
+        ("cached", styling.PaintedComboBox, True),
+    )
+    columns = 10
+    repeat = max(1, repeat // 20)
+
+    results = {}
+    original = styling.PaintedComboBox.cacheFrames
+    try:
+        for path, comboType, cached in paths:
+            if cached is not None:
+                comboType.cacheFrames = cached
+            form = QWidget()
+            layout = QGridLayout(form)
+            combos = []
+            for i in range(count):
+                combo = comboType(form)
+                combo.addItems(["Choice 1", "Choice 2", "Choice 3"])
+                layout.addWidget(combo, i // columns, i % columns)
+                combos.append(combo)
+            form.show()
+            QApplication.processEvents()
+
+            def repaintAll():
+                for combo in combos:
+                    combo.repaint()
+
+            # The first pass builds the caches, it is not what scrolling costs
+            repaintAll()
+            results[path] = {
+                "repaint": (timeIt(repaintAll, repeat), count * repeat),
+            }
+            disposeWidget(form)
+    finally:
+        styling.PaintedComboBox.cacheFrames = original
+
+    printResults("PaintedComboBox.paintEvent", results, "QComboBox")
+    return results
+
+
+# The palette, QSS, style factory and custom paint strategies, plus the
+# unstyled default. StyleWidget is not offered by the ControllerWidget UI.
+STRATEGIES = dict(styling.ControllerWidget.widget_type_map,
+                  style=styling.StyleWidget)
+
+
+def contrastingStyle(uiType):
+    """A callable applying a global style different from uiType's own"""
+    if uiType is styling.StyleWidget:
+        return lambda: uiType.initGlobalStyle("Windows")
+    if uiType is styling.QssWidget:
+        return styling.DefaultWidget.initGlobalStyle
+    return styling.QssWidget.initGlobalStyle
+
+
+def stressStrategy(uiType, count, repeat):
+    """
+    Measure one styling strategy with ``count`` instances laid out in a grid
+
+    Memory is the growth in resident set size over construction and first
+    paint. It is only meaningful in a fresh process, otherwise memory freed
+    by earlier runs is reused, see ``benchmarkStylingStrategies``.
+
+    :return: dict of seconds per operation and bytes per widget
+    """
+    # Theme switching goes to a contrasting global style and back
+    switchAway = contrastingStyle(uiType)
+
+    uiType.initGlobalStyle()
+    QApplication.processEvents()
+    gc.collect()
+    memoryBefore = residentMemory()
+
+    grid = QWidget()
+    layout = QGridLayout(grid)
+    columns = max(1, int(math.sqrt(count)))
+
+    start = time.perf_counter()
+    for i in range(count):
+        widget = uiType()
+        widget.setWindowTitle(uiType.__name__)
+        widget.initUi()
+        widget.initInstanceStyle()
+        layout.addWidget(widget, i // columns, i % columns)
+    construction = time.perf_counter() - start
+
+    # Showing polishes and lays out everything before the first paint
+    start = time.perf_counter()
+    grid.show()
+    grid.repaint()
+    firstPaint = time.perf_counter() - start
+
+    memoryAfter = residentMemory()
+    repaint = timeIt(grid.repaint, repeat) / repeat
+
+    def switchTheme():
+        switchAway()
+        grid.repaint()
+        uiType.initGlobalStyle()
+        grid.repaint()
+
+    switches = max(1, repeat // 10)
+    themeSwitch = timeIt(switchTheme, switches) / (2 * switches)
+
+    disposeWidget(grid)
+
+    memory = None
+    if memoryBefore is not None and memoryAfter is not None:
+        memory = float(memoryAfter - memoryBefore) / count
+    return dict(
+        construction=construction,
+        firstPaint=firstPaint,
+        repaint=repaint,
+        themeSwitch=themeSwitch,
+        memoryPerWidget=memory,
+    )
+
+
+def stressInSubprocess(name, count, repeat):
+    """Run ``stressStrategy`` in a fresh interpreter and return its result"""
+    command = [sys.executable, os.path.abspath(__file__),
+               "--stress-one", name, str(count), "--repeat", str(repeat)]
+    process = subprocess.run(command, stdout=subprocess.PIPE,
+                             stderr=subprocess.PIPE, universal_newlines=True)
+    if process.returncode != 0:
+        raise RuntimeError("Stressing {} with N={} failed:\n{}".format(
+            name, count, process.stderr))
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+
+def benchmarkStylingStrategies(repeat=200, counts=(10, 50, 200)):
+    """
+    Stress every styling strategy in ``STRATEGIES``
+
+    Each strategy is measured at every count, each in its own process so
+    timings and memory figures do not depend on earlier runs. The scaling
+    column divides the per-widget cost at the largest count by the cost at
+    the smallest, 1.0 means cost grows linearly with the number of widgets.
+    """
+    counts = sorted(counts)
+    repeat = max(1, repeat // 20)
+
+    results = {}
+    for name in sorted(STRATEGIES):
+        results[name] = {}
+        for count in counts:
+            results[name][count] = stressInSubprocess(name, count, repeat)
+
+    print("\nStyling strategies (ms, KiB per widget)")
+    print("{:<10} {:>6} {:>12} {:>12} {:>12} {:>12} {:>10}".format(
+        "strategy", "N", "construct", "first paint", "repaint",
+        "theme switch", "memory"))
+    for name, byCount in results.items():
+        for count, result in byCount.items():
+            memory = result["memoryPerWidget"]
+            print("{:<10} {:>6} {:>12.2f} {:>12.2f} {:>12.2f} {:>12.2f} "
+                  "{:>10}".format(
+                      name, count,
+                      1000 * result["construction"],
+                      1000 * result["firstPaint"],
+                      1000 * result["repaint"],
+                      1000 * result["themeSwitch"],
+                      "n/a" if memory is None else
+                      "{:.1f}".format(memory / 1024)))
+
+    if len(counts) > 1:
+        low, high = counts[0], counts[-1]
+        print("\nScaling from N={} to N={} (per widget, 1.0 is linear)"
+              .format(low, high))
+        for name, byCount in results.items():
+            ratios = []
+            for key in ("construction", "firstPaint", "repaint",
+                        "themeSwitch"):
+                perLow = byCount[low][key] / low
+                perHigh = byCount[high][key] / high
+                ratios.append("{}={:.2f}".format(key, perHigh / perLow))
+            print("{:<10} {}".format(name, " ".join(ratios)))
+
+    return results
+
+
+BENCHMARKS = dict(
+    painted=benchmarkPaintedWidget,
+    combo=benchmarkPaintedComboBox,
+    stress=benchmarkStylingStrategies,
+)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("benchmarks", nargs="*", metavar="BENCHMARK",
+                        help="benchmarks to run, all of them by default: "
+                             + ", ".join(sorted(BENCHMARKS)))
+    parser.add_argument("--repeat", type=int, default=200,
+                        help="number of iterations per workload")
+    parser.add_argument("--counts", type=int, nargs="+",
+                        default=[10, 50, 200],
+                        help="widget counts for the stress benchmark")
+    parser.add_argument("--json", metavar="PATH",
+                        help="also write all results to a JSON file")
+    # Used by the stress benchmark to measure one strategy per process
+    parser.add_argument("--stress-one", nargs=2, metavar=("STRATEGY", "N"),
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    unknown = sorted(set(args.benchmarks) - set(BENCHMARKS))
+    if unknown:
+        parser.error("unknown benchmark(s): {}".format(", ".join(unknown)))
+
+    _app = QApplication.instance() or QApplication(sys.argv[:1])
+    _app.setStyle("Fusion")
+
+    if args.stress_one:
+        name, count = args.stress_one
+        result = stressStrategy(STRATEGIES[name], int(count), args.repeat)
+        print(json.dumps(result))
+        return
+
+    results = {}
+    for name in args.benchmarks or sorted(BENCHMARKS):
+        options = dict(repeat=args.repeat)
+        if name == "stress":
+            options["counts"] = args.counts
+        results[name] = BENCHMARKS[name](**options)
+
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,26 @@
 #!/usr/bin/env python
 import os
 import sys
+import glob
+import codecs
 import pickle
+import tempfile
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
 
 from PySide2.QtCore import (
     Qt,
+    QObject,
+    QThread,
+    Signal,
+    Slot,
     QResource,
     QSettings,
     QSize,
+    QSizeF,
     QPoint,
+    QRectF,
+    QMarginsF,
     QByteArray,
 )
 
@@ -16,6 +28,10 @@ from PySide2.QtGui import (
     QKeySequence,
     QTextCharFormat,
     QTextCursor,
+    QPainter,
+    QPdfWriter,
+    QPageSize,
+    QPageLayout,
 )
 
 from PySide2.QtWidgets import (
@@ -27,22 +43,221 @@ from PySide2.QtWidgets import (
     QAction,
     QToolBar,
     QFontComboBox,
+    QProgressDialog,
 )
 
+import qssThemes
+
 
 __version__ = "0.0.1"
 
 
-def getStyleSheet():
+def getStyleSheet(theme="dark", **variables):
     """
-    Reads in the style sheet resource
+    Reads in the style sheet resource, compiled for a theme
+
+    See ``qssThemes.compileTheme`` for the theme names and variables.
     """
     dirname = os.path.dirname(__file__)
     rccPath = os.path.join(dirname, "resources.rcc")
     QResource.registerResource(rccPath)
-    qssPath = os.path.join(dirname, "sample.css")
-    with open(qssPath, "r") as fh:
-        return fh.read()
+    return qssThemes.compileTheme(theme, **variables)
+
+
+def expandFilePaths(args):
+    """
+    Expand command line file arguments, including glob patterns
+
+    Arguments without glob magic are kept as-is so missing files can still be
+    reported. Duplicates are dropped while preserving order.
+    """
+    filePaths = []
+    for arg in args:
+        if glob.has_magic(arg):
+            matches = sorted(glob.glob(arg, recursive=True))
+            filePaths.extend(m for m in matches if os.path.isfile(m))
+        else:
+            filePaths.append(arg)
+
+    seen = set()
+    unique = []
+    for filePath in filePaths:
+        key = os.path.abspath(filePath)
+        if key not in seen:
+            seen.add(key)
+            unique.append(filePath)
+    return unique
+
+
+class FileLoader(QObject):
+    """
+    Read and decode files on a thread pool
+
+    Each file is emitted through ``fileLoaded`` as soon as its worker finishes,
+    so the first document is available without waiting on the rest. Signals
+    are emitted from worker threads and queued to the GUI thread by Qt.
+    """
+
+    fileLoaded = Signal(str, str)
+    fileFailed = Signal(str, str)
+
+    def __init__(self, maxWorkers=None, parent=None):
+        super(FileLoader, self).__init__(parent)
+        self._executor = ThreadPoolExecutor(max_workers=maxWorkers)
+        self._shutdown = False
+
+    def load(self, filePaths):
+        """Queue files to be read in the background"""
+        for filePath in filePaths:
+            future = self._executor.submit(self._read, filePath)
+            future.add_done_callback(partial(self._done, filePath))
+
+    def shutdown(self):
+        """Stop accepting work, reads that have not started are cancelled"""
+        self._shutdown = True
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    def _read(filePath):
+        with open(filePath) as fh:
+            return fh.read()
+
+    def _done(self, filePath, future):
+        # Reads still running at shutdown may outlive the loader itself
+        if self._shutdown or future.cancelled():
+            return
+        try:
+            text = future.result()
+        except Exception as exc:
+            self.fileFailed.emit(filePath, str(exc))
+        else:
+            self.fileLoaded.emit(filePath, text)
+
+
+class PdfExporter(QObject):
+    """
+    Lay out, paginate and write a document to PDF on a worker thread
+
+    The exporter takes ownership of ``document``, which should be a clone
+    moved to the worker thread together with the exporter. The document is
+    laid out block by block and each page is written as soon as it is laid
+    out, so cancelling takes effect during layout too. Pages go to a
+    temporary file next to the target, which replaces the target only once
+    the export succeeds. A cancelled or failed export leaves it untouched.
+
+    ``pageExported`` carries the page just written and an estimate of the
+    page count, which becomes exact once layout is complete.
+    """
+
+    pageExported = Signal(int, int)
+    finished = Signal(str)
+    failed = Signal(str, str)
+
+    marginMillimeters = 15
+
+    def __init__(self, document, filePath):
+        super(PdfExporter, self).__init__()
+        self._document = document
+        self._filePath = filePath
+        self._canceled = False
+
+    def cancel(self):
+        """Stop after the page currently being written"""
+        self._canceled = True
+
+    @Slot()
+    def run(self):
+        """Export every page, emitting progress after each one"""
+        document = self._document
+        writer = None
+        painter = QPainter()
+        error = None
+        tempPath = None
+        try:
+            fd, tempPath = tempfile.mkstemp(
+                prefix=".{}.".format(os.path.basename(self._filePath)),
+                suffix=".part",
+                dir=os.path.dirname(os.path.abspath(self._filePath)))
+            os.close(fd)
+            writer = QPdfWriter(tempPath)
+            writer.setPageSize(QPageSize(QPageSize.A4))
+            margin = self.marginMillimeters
+            writer.setPageMargins(
+                QMarginsF(margin, margin, margin, margin),
+                QPageLayout.Millimeter)
+
+            # Lay out against the writer so fonts are measured at its DPI
+            document.documentLayout().setPaintDevice(writer)
+            pageRect = writer.pageLayout().paintRectPixels(
+                writer.resolution())
+            document.setPageSize(QSizeF(pageRect.size()))
+
+            if not painter.begin(writer):
+                raise IOError("Could not write {}".format(self._filePath))
+            self._exportPages(document, writer, painter, pageRect)
+            painter.end()
+        except Exception as exc:
+            error = str(exc)
+        else:
+            if self._canceled:
+                error = "Export cancelled"
+        finally:
+            if painter.isActive():
+                painter.end()
+            # Dropping the writer closes the file
+            painter = writer = None
+            self._document = None
+            document.deleteLater()
+
+        if error is None:
+            try:
+                os.replace(tempPath, self._filePath)
+            except OSError as exc:
+                error = str(exc)
+            else:
+                self.finished.emit(self._filePath)
+                return
+        if tempPath is not None:
+            try:
+                os.remove(tempPath)
+            except OSError:
+                pass
+        self.failed.emit(self._filePath, error)
+
+    def _exportPages(self, document, writer, painter, pageRect):
+        """Write pages as the layout reaches them, checking for cancel"""
+        layout = document.documentLayout()
+        width = pageRect.width()
+        height = pageRect.height()
+        blockCount = max(1, document.blockCount())
+
+        def writePage(page, pageCount):
+            if page:
+                writer.newPage()
+            painter.save()
+            painter.translate(0, -page * height)
+            document.drawContents(
+                painter, QRectF(0, page * height, width, height))
+            painter.restore()
+            self.pageExported.emit(page + 1, pageCount)
+
+        page = 0
+        block = document.begin()
+        while block.isValid():
+            if self._canceled:
+                return
+            # Only lays out the document up to and including this block
+            bottom = layout.blockBoundingRect(block).bottom()
+            while bottom > (page + 1) * height:
+                done = float(block.blockNumber() + 1) / blockCount
+                writePage(page, max(page + 1, int(page / done)))
+                page += 1
+            block = block.next()
+
+        pageCount = document.pageCount()
+        while page < pageCount and not self._canceled:
+            writePage(page, pageCount)
+            page += 1
 
 
 class WindowSettings(object):
@@ -158,6 +373,112 @@ class WindowSettings(object):
         self.readSettings()
 
 
+class TextEdit(QPlainTextEdit):
+    """
+    Plain text editor that inserts very large pastes in batches
+
+    A single ``insertFromMimeData`` call on hundreds of MB of text blocks the
+    event loop until it returns. Payloads above ``largePasteThreshold`` bytes
+    are instead decoded and inserted ``pasteChunkSize`` bytes at a time, so
+    only one batch exists as text at once. Everything goes into one edit
+    block so the paste is still undone in a single step.
+    """
+
+    largePasteThreshold = 4 * 1024 * 1024
+    pasteChunkSize = 256 * 1024
+
+    def insertFromMimeData(self, source):
+        """Insert clipboard or drag and drop data at the cursor"""
+        if source.hasText():
+            # Raw bytes, source.text() would decode the whole payload at once
+            data = source.data("text/plain")
+            if data.size() > self.largePasteThreshold:
+                self.insertLargeData(data)
+                return
+        super(TextEdit, self).insertFromMimeData(source)
+
+    def insertLargeData(self, data, encoding="utf-8"):
+        """
+        Decode and insert encoded text in batches, see ``insertLargeText``
+
+        :param data: QByteArray holding the encoded text
+        """
+        decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+        total = data.size()
+        chunkSize = self.pasteChunkSize
+
+        def batches():
+            for start in range(0, total, chunkSize):
+                end = min(start + chunkSize, total)
+                # An incremental decoder holds back a character split
+                # across the batch boundary until the next batch
+                chunk = bytes(data.mid(start, end - start).data())
+                yield decoder.decode(chunk, end == total), end
+
+        return self._insertBatches(batches(), total)
+
+    def insertLargeText(self, text):
+        """
+        Insert text in batches, yielding to the event loop in between
+
+        A progress dialog is shown while inserting. Cancelling it rolls back
+        everything inserted so far.
+
+        :return: False if the user cancelled, True otherwise
+        """
+        total = len(text)
+        chunkSize = self.pasteChunkSize
+        batches = ((text[start:start + chunkSize],
+                    min(start + chunkSize, total))
+                   for start in range(0, total, chunkSize))
+        return self._insertBatches(batches, total)
+
+    def _insertBatches(self, batches, total):
+        """
+        Insert ``(text, progress)`` batches in one edit block
+
+        :return: False if the user cancelled, True otherwise
+        """
+        progress = QProgressDialog(
+            "Pasting text...", "Cancel", 0, total, self)
+        progress.setWindowTitle("Paste")
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(500)
+
+        cursor = self.textCursor()
+        # insertText replaces the selection, the paste starts where it did
+        insertStart = cursor.selectionStart()
+        cursor.beginEditBlock()
+        canceled = False
+        try:
+            for text, done in batches:
+                cursor.insertText(text)
+                progress.setValue(done)
+                QApplication.processEvents()
+                if progress.wasCanceled():
+                    canceled = True
+                    break
+        finally:
+            cursor.endEditBlock()
+            progress.reset()
+
+        if canceled:
+            if self.document().isUndoRedoEnabled():
+                # Everything was inserted in one edit block, undo removes
+                # it all and restores any replaced selection
+                self.document().undo()
+            else:
+                insertEnd = cursor.position()
+                cursor.setPosition(insertStart)
+                cursor.setPosition(insertEnd, QTextCursor.KeepAnchor)
+                cursor.removeSelectedText()
+            return False
+
+        self.setTextCursor(cursor)
+        self.ensureCursorVisible()
+        return True
+
+
 class MainWindow(QMainWindow):
     text = None
     fileMenu = None
@@ -165,10 +486,12 @@ class MainWindow(QMainWindow):
     saveAction = None
     saveAsAction = None
     closeAction = None
+    exportPdfAction = None
     prefsMenu = None
     themeMenu = None
     darkAction = None
     lightAction = None
+    highContrastAction = None
     helpMenu = None
     aboutAction = None
     aboutQtAction = None
@@ -180,6 +503,7 @@ class MainWindow(QMainWindow):
         window = cls()
         window.setToolName("TextEditExample")
         window.initUi()
+        window.initSettings()
         window.initWindowStyle(*args)
         return window
 
@@ -197,7 +521,29 @@ class MainWindow(QMainWindow):
         """
         Switch UI to a dark theme
         """
-        QApplication.instance().setStyleSheet(getStyleSheet())
+        cls.setTheme("dark")
+
+    @classmethod
+    def setLightTheme(cls):
+        """
+        Switch UI to a light theme
+        """
+        cls.setTheme("light")
+
+    @classmethod
+    def setHighContrastTheme(cls):
+        """
+        Switch UI to a high contrast theme
+        """
+        cls.setTheme("highContrast")
+
+    @classmethod
+    def setTheme(cls, theme, **variables):
+        """
+        Switch UI to a theme compiled from the style sheet template
+        """
+        QApplication.instance().setStyleSheet(
+            getStyleSheet(theme, **variables))
         QApplication.instance().setPalette(
             QApplication.style().standardPalette())
 
@@ -216,22 +562,37 @@ class MainWindow(QMainWindow):
         self._filePath = None
         self._recentFiles = []
         self._maxNumRecentFiles = 4
+        self._fileLoader = None
+        self._pendingLoads = 0
+        self._failedLoads = []
+        self._childWindows = []
+        self._pdfExporter = None
+        self._pdfExportThread = None
 
     def initUi(self):
         """Construct a new UI instance"""
         self.setObjectName(self.__class__.__name__)
         self.setWindowTitle(self.toolName())
-        self.text = text = QPlainTextEdit()
+        self.text = text = TextEdit()
         self.setCentralWidget(text)
         self.addMenus()
         self.addActions()
         self.addFileToolBar()
         self.addTextToolBar()
+        self.connectSignals()
+        self.statusBar().showMessage("Ready")
+
+    def initSettings(self):
+        """
+        Restore saved settings and save them again on quit
+
+        Only the primary window does this, secondary windows sharing the same
+        settings key would otherwise overwrite its geometry on quit.
+        """
         self.settings = WindowSettings(
             self, "XYZ-Company", self.toolName(), __version__)
         self.settings.readSettings()
-        self.connectSignals()
-        self.statusBar().showMessage("Ready")
+        QApplication.instance().aboutToQuit.connect(self.settings.save)
 
     def saveState(self):
         """Collect internal data to save"""
@@ -277,12 +638,15 @@ class MainWindow(QMainWindow):
         saveAction.setShortcut(QKeySequence.Save)
         self.saveAsAction = saveAsAction = QAction("Save &As...", self)
         saveAsAction.setShortcut(QKeySequence.SaveAs)
+        self.exportPdfAction = exportPdfAction = QAction(
+            "&Export PDF...", self)
         self.closeAction = closeAction = QAction("&Close", self)
         closeAction.setShortcut(QKeySequence.Close)
         self.fileMenu.addActions([
             openAction,
             saveAction,
             saveAsAction,
+            exportPdfAction,
             closeAction,
         ])
 
@@ -295,8 +659,10 @@ class MainWindow(QMainWindow):
 
         self.darkAction = darkAction = QAction("Dark", self)
         self.lightAction = lightAction = QAction("Light", self)
+        self.highContrastAction = highContrastAction = QAction(
+            "High Contrast", self)
         self.themeMenu.addActions([
-            darkAction, lightAction,
+            darkAction, lightAction, highContrastAction,
         ])
 
         self.aboutAction = aboutAction = QAction("&About", self)
@@ -335,19 +701,21 @@ class MainWindow(QMainWindow):
         self.openAction.triggered.connect(self.openFile)
         self.saveAction.triggered.connect(self.save)
         self.saveAsAction.triggered.connect(self.saveAs)
+        self.exportPdfAction.triggered.connect(self.exportPdf)
         self.closeAction.triggered.connect(self.close)
         for recentfAction in self.recentFileActions:
             recentfAction.triggered.connect(self.openRecent)
         self.darkAction.triggered.connect(self.setDarkTheme)
-        self.lightAction.triggered.connect(self.initGlobalStyle)
+        self.lightAction.triggered.connect(self.setLightTheme)
+        self.highContrastAction.triggered.connect(self.setHighContrastTheme)
         self.aboutAction.triggered.connect(self.about)
         self.aboutQtAction.triggered.connect(QApplication.instance().aboutQt)
         self.fontCombo.currentFontChanged.connect(self.currentFontChanged)
-        QApplication.instance().aboutToQuit.connect(self.settings.save)
 
     def closeEvent(self, event):
         """Perform all actions that must happen upon closing the window"""
         if not self.text.document().isModified():
+            self._stopPdfExport()
             return
         answer = QMessageBox.question(
             self, None,
@@ -358,6 +726,8 @@ class MainWindow(QMainWindow):
             self.save()
         elif answer & QMessageBox.Cancel:
             event.ignore()
+        if event.isAccepted():
+            self._stopPdfExport()
 
     def save(self):
         """Save the text to disk"""
@@ -381,6 +751,145 @@ class MainWindow(QMainWindow):
         filePath = QFileDialog.getOpenFileName(self, "Open")[0]
         self._loadFile(filePath)
 
+    def exportPdf(self):
+        """
+        Export the text to PDF without blocking the editor
+
+        A clone of the document is laid out and paginated on a worker thread,
+        progress is shown in the status bar.
+        """
+        if self._pdfExportThread is not None:
+            return
+        filePath = QFileDialog.getSaveFileName(
+            self, "Export PDF", "", "PDF (*.pdf)")[0]
+        if not filePath:
+            return
+        if not filePath.lower().endswith(".pdf"):
+            filePath += ".pdf"
+            # The dialog only confirmed overwriting the name without suffix
+            if os.path.exists(filePath):
+                answer = QMessageBox.question(
+                    self, "Export PDF",
+                    "{} already exists.\nDo you want to replace it?".format(
+                        os.path.basename(filePath)),
+                    QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+                if answer != QMessageBox.Yes:
+                    return
+
+        document = self.text.document().clone()
+        document.setDefaultFont(self.text.font())
+
+        self._pdfExportThread = thread = QThread(self)
+        self._pdfExporter = exporter = PdfExporter(document, filePath)
+        document.moveToThread(thread)
+        exporter.moveToThread(thread)
+
+        thread.started.connect(exporter.run)
+        exporter.pageExported.connect(self._onPdfPageExported)
+        exporter.finished.connect(self._onPdfExported)
+        exporter.failed.connect(self._onPdfExportFailed)
+        # Quit from the worker itself, a queued quit would deadlock with the
+        # wait() in _stopPdfExport
+        exporter.finished.connect(thread.quit, Qt.DirectConnection)
+        exporter.failed.connect(thread.quit, Qt.DirectConnection)
+        thread.finished.connect(self._onPdfExportThreadFinished)
+
+        self.exportPdfAction.setEnabled(False)
+        self.statusBar().showMessage("Laying out document for PDF export...")
+        thread.start()
+
+    def _onPdfPageExported(self, page, pageCount):
+        self.statusBar().showMessage(
+            "Exporting PDF: page {} of about {}".format(page, pageCount))
+
+    def _onPdfExported(self, filePath):
+        self.statusBar().showMessage("Exported {}".format(filePath), 5000)
+
+    def _onPdfExportFailed(self, filePath, message):
+        self.statusBar().showMessage(
+            "PDF export failed: {}".format(message), 5000)
+
+    def _onPdfExportThreadFinished(self):
+        self._pdfExporter = None
+        self._pdfExportThread.deleteLater()
+        self._pdfExportThread = None
+        self.exportPdfAction.setEnabled(True)
+
+    def _stopPdfExport(self):
+        """Cancel a running export and wait for the worker to wind down"""
+        if self._pdfExportThread is None:
+            return
+        self._pdfExporter.cancel()
+        self._pdfExportThread.wait()
+
+    def openFiles(self, filePaths):
+        """
+        Open many files at once, reading them concurrently
+
+        The first file to finish loading goes into this window if it is still
+        empty, every other file gets a window of its own.
+        """
+        if not filePaths:
+            return
+        if self._fileLoader is None:
+            self._fileLoader = FileLoader(parent=self)
+            self._fileLoader.fileLoaded.connect(self._onFileLoaded)
+            self._fileLoader.fileFailed.connect(self._onFileFailed)
+            QApplication.instance().aboutToQuit.connect(
+                self._fileLoader.shutdown)
+        self.statusBar().showMessage(
+            "Opening {} file(s)...".format(len(filePaths)))
+        self._pendingLoads += len(filePaths)
+        self._fileLoader.load(filePaths)
+
+    def _onFileLoaded(self, filePath, text):
+        """Show a document that finished loading in the background"""
+        window = self
+        if (self._filePath is not None
+                or self.text.document().isModified()
+                or not self.text.document().isEmpty()):
+            # Skip init(), re-applying the global style would reset the theme
+            # and secondary windows must not save settings
+            window = self.__class__()
+            window.initUi()
+            window.setAttribute(Qt.WA_DeleteOnClose)
+            window.destroyed.connect(
+                lambda *args, w=window: self._childWindows.remove(w))
+            offset = 20 * (len(self._childWindows) + 1)
+            window.resize(self.size())
+            window.move(self.pos() + QPoint(offset, offset))
+            window.show()
+            self._childWindows.append(window)
+        window._setFileText(filePath, text)
+        self.statusBar().showMessage("Opened {}".format(filePath), 2000)
+        self._fileLoadFinished()
+
+    def _onFileFailed(self, filePath, message):
+        """Collect a file that could not be read in the background"""
+        self._failedLoads.append((filePath, message))
+        self._removeRecentFile(filePath)
+        self.statusBar().showMessage(
+            "Could not open {} file(s)".format(len(self._failedLoads)))
+        self._fileLoadFinished()
+
+    def _fileLoadFinished(self):
+        """Report every failure in one dialog once all loads are done"""
+        self._pendingLoads -= 1
+        if self._pendingLoads > 0 or not self._failedLoads:
+            return
+        failed, self._failedLoads = self._failedLoads, []
+        maxListed = 10
+        lines = ["{}: {}".format(filePath, message)
+                 for filePath, message in failed[:maxListed]]
+        if len(failed) > maxListed:
+            lines.append("... and {} more".format(len(failed) - maxListed))
+        QMessageBox.warning(
+            self,
+            "File Error",
+            "Could not open {} file(s).\n{}".format(
+                len(failed), "\n".join(lines)),
+        )
+
     def openRecent(self):
         """Open the most recently edited file"""
         action = self.sender()
@@ -400,8 +909,11 @@ class MainWindow(QMainWindow):
             self._removeRecentFile(filePath)
             return
         if filePath:
-            self.text.setPlainText(open(filePath).read())
+            self._setFileText(filePath, open(filePath).read())
 
+    def _setFileText(self, filePath, text):
+        """Replace the editor contents with a file's text"""
+        self.text.setPlainText(text)
         self._updateCurrentFile(filePath)
 
     def _removeRecentFile(self, filePath):
@@ -498,4 +1010,6 @@ if __name__ == "__main__":
 
     ui = MainWindow.init()
     ui.show()
+    # arguments() has Qt's own options such as -style already removed
+    ui.openFiles(expandFilePaths(_app.arguments()[1:]))
     _app.exec_()